@@ -1,59 +1,62 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-from datetime import datetime
-from pathlib import Path
 import os
-import csv
+import hmac
+
+from walk_utils import (
+    LOG_PATH,
+    build_fig,
+    df_key,
+    download_log,
+    load_log,
+    load_table,
+    log_download,
+    render_png,
+    update_fig,
+)
+
+try:
+    from plotly_resampler import FigureResampler
+except ImportError:  # optional: large series are sent to the browser as-is
+    FigureResampler = None
 
 # Set page configuration
 st.set_page_config(page_title="Econophysics Random Walk", page_icon="📈", layout="wide")
 
-LOG_PATH = Path("download_logs.csv")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
-
-
-def log_download(name: str, title: str) -> None:
-    """Append download metadata to CSV log with a timestamp."""
-    cleaned_name = name.strip()
-    if not cleaned_name:
-        return
-
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    is_new_file = not LOG_PATH.exists()
-    with LOG_PATH.open("a", newline="") as f:
-        writer = csv.writer(f)
-        if is_new_file:
-            writer.writerow(["timestamp", "name", "title"])
-        writer.writerow([datetime.utcnow().isoformat(), cleaned_name, title])
+# Above this many rows the on-screen chart is downsampled with plotly-resampler
+RESAMPLE_THRESHOLD = 2000
 
 
 # Admin routing: if admin view is requested, show only the log tools
-params = st.experimental_get_query_params()
-is_admin = params.get("admin", ["0"])[0] == "1"
-provided_token = params.get("token", [""])[0]
+params = st.query_params
+is_admin = params.get("admin") == "1"
+provided_token = params.get("token", "")
 
 if is_admin:
     st.title("Admin: Download Log")
     if not ADMIN_TOKEN:
         st.warning("ADMIN_TOKEN environment variable is not set; admin view is disabled.")
-    elif provided_token != ADMIN_TOKEN:
+    elif not hmac.compare_digest(provided_token.encode(), ADMIN_TOKEN.encode()):
         st.error("Unauthorized: invalid token.")
     else:
+        # Write out buffered rows so the view is current
+        download_log().flush()
         if LOG_PATH.exists():
-            log_df = pd.read_csv(LOG_PATH)
+            log_df, log_bytes = load_log(LOG_PATH.stat().st_mtime_ns)
             st.dataframe(log_df, use_container_width=True)
             st.download_button(
                 label="Download log CSV",
-                data=LOG_PATH.read_bytes(),
+                data=log_bytes,
                 file_name="download_logs.csv",
                 mime="text/csv"
             )
             if st.button("Clear log", type="secondary"):
+                download_log().discard()
                 LOG_PATH.unlink(missing_ok=True)
                 st.success("Download log cleared.")
-                st.experimental_rerun()
+                st.rerun()
         else:
             st.info("No downloads have been logged yet.")
 
@@ -75,11 +78,8 @@ if data_option == "Upload File (Excel/CSV)":
     
     if uploaded_file is not None:
         try:
-            # Read the file
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            # Read the file (cached on name + contents)
+            df = load_table(uploaded_file.name, uploaded_file.getvalue())
             
             st.success("File uploaded successfully!")
             
@@ -89,8 +89,17 @@ if data_option == "Upload File (Excel/CSV)":
             # Normalize columns to 'Time' and 'Price'
             if len(df.columns) >= 2:
                 # Assume first column is Time and second is Price
-                df.columns = ['Time', 'Price'] + list(df.columns[2:])
-                df = df[['Time', 'Price']]
+                t, p = df.iloc[:, 0], df.iloc[:, 1]
+                # Narrow dtypes: long integer time indices and float64 prices don't need 8 bytes.
+                # Time stops at int32 so values typed into the dynamic editor still fit.
+                i32 = np.iinfo(np.int32)
+                if (pd.api.types.is_integer_dtype(t) and t.dtype.itemsize > 4
+                        and i32.min <= t.min() and t.max() <= i32.max):
+                    t = t.astype("int32[pyarrow]" if isinstance(t.dtype, pd.ArrowDtype) else np.int32)
+                if pd.api.types.is_numeric_dtype(p):
+                    p = pd.to_numeric(p, downcast='float')
+                # Build the two-column frame once; column data is only copied where it was downcast
+                df = pd.DataFrame({'Time': t, 'Price': p}, copy=False)
                 st.info("Columns normalized to 'Time' and 'Price'")
             else:
                 st.error("File must have at least 2 columns")
@@ -103,33 +112,50 @@ else:
     # Generate default random walk
     st.write("Generating default random walk (Time 0-15, Price start 100)")
     
-    # Set random seed for reproducibility
-    np.random.seed(42)
+    # Seeded generator for reproducibility
+    rng = np.random.default_rng(42)
     
     # Generate time steps
-    time = np.arange(0, 16)
+    time = np.arange(16, dtype=np.int32)
     
-    # Generate random walk starting at 100
-    price = [100]
-    for i in range(15):
-        # Random walk: add random change from normal distribution
-        change = np.random.normal(0, 2)
-        price.append(price[-1] + change)
+    # Generate random walk starting at 100: cumulative sum of normal steps, written in place
+    price = np.empty(16, dtype=np.float64)
+    price[0] = 100.0
+    np.cumsum(rng.normal(0.0, 2.0, size=15), out=price[1:])
+    price[1:] += 100.0
     
-    df = pd.DataFrame({
-        'Time': time,
-        'Price': price
-    })
+    df = pd.DataFrame({'Time': time, 'Price': price}, copy=False)
     
     st.success("Default random walk generated!")
 
 # Edit Data Section
 if df is not None:
     st.header("2. Edit Data")
-    st.write("You can manually edit the data below:")
+    st.write("Tick \"Edit data\" to edit the table below; your edits are kept when editing is switched off.")
     
-    # Display data editor
-    edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True)
+    # Edits live in session state and are only reset when the source data changes
+    source_key = df_key(df)
+    if st.session_state.get("source_key") != source_key:
+        st.session_state["source_key"] = source_key
+        st.session_state["edited_df"] = df
+        st.session_state.pop("editor_base", None)
+    
+    # Display data editor only when editing is wanted; the read-only table avoids
+    # round-tripping the edited state on every rerun
+    if st.checkbox("Edit data"):
+        # The editor keeps its own deltas while shown, so its input stays fixed until it is hidden
+        if "editor_base" not in st.session_state:
+            st.session_state["editor_base"] = st.session_state["edited_df"]
+        st.session_state["edited_df"] = st.data_editor(
+            st.session_state["editor_base"],
+            num_rows="dynamic",
+            use_container_width=True,
+            key=f"editor_{source_key}"
+        )
+    else:
+        st.session_state.pop("editor_base", None)
+        st.dataframe(st.session_state["edited_df"], use_container_width=True)
+    edited_df = st.session_state["edited_df"]
     
     # Plot Section
     st.header("3. Random Walk Visualization")
@@ -139,58 +165,47 @@ if df is not None:
     cleaned_title = document_title.strip() or "Random Walk Report"
     download_name = "_".join(cleaned_title.split()) or "random_walk_report"
 
-    # Create plotly line chart
-    fig = px.line(
-        edited_df,
-        x='Time',
-        y='Price',
-        title=cleaned_title,
-        labels={'Price': 'Price (₹)'},
-        markers=True
-    )
-    
-    # Update layout
-    fig.update_traces(line=dict(color='blue', width=2),
-                     marker=dict(size=8, color='red'))
-    
-    fig.update_layout(
-        xaxis_title='Time',
-        yaxis_title='Price (₹)',
-        hovermode='x unified',
-        showlegend=False,
-        title=dict(font=dict(size=22), x=0.02)
-    )
-
     # Require a name before showing/download; also stamp it on the image
     downloader_name = st.text_input("Your name (shown on the image and stored privately with download)", value="")
     cleaned_name = downloader_name.strip()
 
-    if cleaned_name:
-        fig.add_annotation(
-            x=0.99,
-            y=1.12,
-            xref="paper",
-            yref="paper",
-            text=f"Downloaded by: {cleaned_name}",
-            showarrow=False,
-            font=dict(size=12, color="gray"),
-            align="right"
-        )
+    time_arr = edited_df['Time'].to_numpy()
+    price_arr = edited_df['Price'].to_numpy()
+    data_key = df_key(edited_df)
+
+    # Create plotly line chart once per session, then only swap its data (with name annotation when provided)
+    if "fig" not in st.session_state:
+        st.session_state.fig = build_fig(time_arr, price_arr, cleaned_title, cleaned_name)
+    else:
+        update_fig(st.session_state.fig, time_arr, price_arr, cleaned_title, cleaned_name)
+    fig = st.session_state.fig
+    if FigureResampler is not None and len(edited_df) > RESAMPLE_THRESHOLD:
+        # Downsample (MinMaxLTTB) to roughly the pixel budget so only that many points are sent
+        fig = FigureResampler(fig)
     
-    # Display the plot (with name annotation when provided)
+    # Display the plot
     st.plotly_chart(fig, use_container_width=True)
 
-    # Download chart as PNG with the chosen title and name stamp
-    image_bytes = fig.to_image(format="png", width=1200, height=800, scale=2, engine="kaleido")
-    st.download_button(
-        label="Download visualization (PNG)",
-        data=image_bytes,
-        file_name=f"{download_name}.png",
-        mime="image/png",
-        disabled=not cleaned_name,
-        on_click=log_download,
-        args=(cleaned_name, cleaned_title)
-    )
+    # Download chart as PNG with the chosen title and name stamp.
+    # Rendering only happens on explicit request; the bytes are kept in session state
+    # together with the inputs they were rendered from, so edits invalidate them.
+    png_key = (data_key, cleaned_title, cleaned_name)
+    if st.session_state.get("png_key") != png_key:
+        st.session_state.pop("png", None)
+
+    if st.button("Generate PNG", disabled=not cleaned_name):
+        st.session_state["png"] = render_png(data_key, cleaned_title, cleaned_name, time_arr, price_arr)
+        st.session_state["png_key"] = png_key
+
+    if "png" in st.session_state:
+        st.download_button(
+            label="Download visualization (PNG)",
+            data=st.session_state["png"],
+            file_name=f"{download_name}.png",
+            mime="image/png",
+            on_click=log_download,
+            args=(cleaned_name, cleaned_title)
+        )
     
     # Information Section
     st.header("4. Observation")
@@ -198,15 +213,19 @@ if df is not None:
     
     # Additional statistics
     with st.expander("View Statistics"):
+        # Pull the ndarray once instead of going through four pandas reductions
+        p = edited_df['Price'].to_numpy(dtype=np.float64, na_value=np.nan)
+        first, last = p[0], p[-1]
+        mn, mx = np.nanmin(p), np.nanmax(p)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Starting Price", f"₹{edited_df['Price'].iloc[0]:.2f}")
+            st.metric("Starting Price", f"₹{first:.2f}")
         with col2:
-            st.metric("Ending Price", f"₹{edited_df['Price'].iloc[-1]:.2f}")
+            st.metric("Ending Price", f"₹{last:.2f}")
         with col3:
-            st.metric("Max Price", f"₹{edited_df['Price'].max():.2f}")
+            st.metric("Max Price", f"₹{mx:.2f}")
         with col4:
-            st.metric("Min Price", f"₹{edited_df['Price'].min():.2f}")
+            st.metric("Min Price", f"₹{mn:.2f}")
 
 else:
     st.warning("Please upload a file or generate default random walk to continue.")
@@ -0,0 +1,171 @@
+"""Helpers shared by the Streamlit app: file loading, download logging and chart rendering."""
+import atexit
+import csv
+import hashlib
+import io
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+LOG_PATH = Path("download_logs.csv")
+# Buffered download-log rows are written out once this many are pending, or after this many seconds
+LOG_FLUSH_ROWS = 32
+LOG_FLUSH_SECONDS = 5.0
+
+
+class DownloadLog:
+    """Process-wide download log: rows are buffered and appended to the CSV in batches."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.rows = []
+        self.lock = threading.Lock()
+        self.fh = None
+        self.timer = None
+
+    def append(self, row: list) -> None:
+        with self.lock:
+            self.rows.append(row)
+            if len(self.rows) >= LOG_FLUSH_ROWS:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(LOG_FLUSH_SECONDS, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self.lock:
+            self._flush_locked()
+            self._close_locked()
+
+    def discard(self) -> None:
+        """Drop pending rows and close the file so it can be deleted and re-created."""
+        with self.lock:
+            self._cancel_timer()
+            self.rows.clear()
+            self._close_locked()
+
+    def _flush_locked(self) -> None:
+        self._cancel_timer()
+        if not self.rows:
+            return
+        if self.fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            is_new_file = not self.path.exists()
+            self.fh = self.path.open("a", newline="")
+            if is_new_file:
+                csv.writer(self.fh).writerow(["timestamp", "name", "title"])
+        csv.writer(self.fh).writerows(self.rows)
+        self.fh.flush()
+        self.rows.clear()
+
+    def _close_locked(self) -> None:
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def _cancel_timer(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
+@st.cache_resource
+def download_log() -> DownloadLog:
+    """One log buffer per process, shared across sessions and reruns; flushed at exit."""
+    log = DownloadLog(LOG_PATH)
+    atexit.register(log.close)
+    return log
+
+
+def log_download(name: str, title: str) -> None:
+    """Append download metadata to CSV log with a timestamp."""
+    cleaned_name = name.strip()
+    if not cleaned_name:
+        return
+
+    download_log().append([datetime.utcnow().isoformat(), cleaned_name, title])
+
+
+@st.cache_data(show_spinner=False)
+def load_table(name: str, data: bytes) -> pd.DataFrame:
+    """Parse uploaded CSV/Excel bytes; cached so reruns skip re-decoding the file."""
+    if name.endswith(".csv"):
+        try:
+            return pd.read_csv(io.BytesIO(data), engine="pyarrow", dtype_backend="pyarrow")
+        except ImportError:
+            # pyarrow is optional; fall back to pandas' C parser
+            return pd.read_csv(io.BytesIO(data), engine="c", low_memory=False, cache_dates=True)
+    try:
+        return pd.read_excel(io.BytesIO(data), engine="calamine")
+    except ImportError:
+        # python-calamine is optional; fall back to pandas' default engine (openpyxl for .xlsx)
+        return pd.read_excel(io.BytesIO(data))
+
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_log(mtime_ns: int) -> tuple[pd.DataFrame, bytes]:
+    """Read the download log; keyed on its mtime so it is only re-parsed after a write."""
+    data = LOG_PATH.read_bytes()
+    return pd.read_csv(io.BytesIO(data)), data
+
+
+def build_fig(time_arr, price_arr, title: str, name: str = ""):
+    """Build the random walk line chart, stamped with the downloader name when given."""
+    # WebGL trace: rendered on the GPU instead of one SVG node per point
+    fig = go.Figure(go.Scattergl(
+        mode='lines+markers',
+        line=dict(color='blue', width=2),
+        marker=dict(size=8, color='red')
+    ))
+    
+    fig.update_layout(
+        title=dict(font=dict(size=22), x=0.02),
+        xaxis_title='Time',
+        yaxis_title='Price (₹)',
+        hovermode='x unified',
+        showlegend=False
+    )
+
+    update_fig(fig, time_arr, price_arr, title, name)
+    return fig
+
+
+def update_fig(fig, time_arr, price_arr, title: str, name: str = "") -> None:
+    """Swap the data, title and name stamp of an existing chart in a single batched update."""
+    with fig.batch_update():
+        fig.data[0].x = time_arr
+        fig.data[0].y = price_arr
+        fig.layout.title.text = title
+        fig.layout.annotations = [dict(
+            x=0.99,
+            y=1.12,
+            xref="paper",
+            yref="paper",
+            text=f"Downloaded by: {name}",
+            showarrow=False,
+            font=dict(size=12, color="gray"),
+            align="right"
+        )] if name else []
+
+
+def df_key(df: pd.DataFrame) -> str:
+    """Order-sensitive content hash of a frame, computed in C rather than via Python tuples."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def render_png(key: str, title: str, name: str, _time_arr: np.ndarray, _price_arr: np.ndarray) -> bytes:
+    """Render the chart to PNG via Kaleido; cached on (key, title, name), the arrays are not hashed."""
+    fig = build_fig(_time_arr, _price_arr, title, name)
+    return fig.to_image(format="png", width=1200, height=800, scale=2, engine="kaleido")